@@ -12,118 +12,171 @@ Split the pad sequence into two equal halves:
   - They maintain a gap of at least d between them
 """
 
-from dataclasses import dataclass, field
-from typing import Optional
+from typing import Optional, Sequence
+
+# (step, partner) of each party: the direction it moves in its half and the
+# party it must stay more than d pads away from. A party's next pad is
+# last_used[party] + step, valid while step * (last_used[partner] - pad) > d.
+PARTY_MOVES = ((1, 1), (-1, 0), (1, 3), (-1, 2))
+
+class _LastUsedSnapshot(list):
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("last_used is a snapshot; assign state.last_used or l0..l3")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
 
 # shared state for the protocol
-@dataclass
 class ProtocolState:
-    n: int  # Pad sequence length
-    d: int  # Gap size
-    # last[i] = last used pad by party i
+    # l{i} = last used pad by party i
     # Party 0: starts at -1, moves right
     # Party 1: starts at n/2, moves left
     # Party 2: starts at n/2-1, moves right
     # Party 3: starts at n, moves left
-    last_used: list[int] = field(default_factory=list)
-
-    def __post_init__(self):
-        if not self.last_used:
-            mid = self.n // 2
-            self.last_used = [-1, mid, mid - 1, self.n]
+    __slots__ = ('n', 'd', 'l0', 'l1', 'l2', 'l3')
+
+    def __init__(self, n: int, d: int, last_used: Optional[Sequence[int]] = None):
+        self.n = n  # Pad sequence length
+        self.d = d  # Gap size
+        if not last_used:
+            mid = n // 2
+            last_used = [-1, mid, mid - 1, n]
+        self.last_used = last_used
+
+    # [l0, l1, l2, l3] as a read-only snapshot list: it still compares equal
+    # to plain lists, but item assignment such as last_used[i] = pad raises
+    # TypeError instead of being silently lost; assign a whole sequence to
+    # last_used, or set l{i}, to change the state
+    @property
+    def last_used(self) -> list[int]:
+        return _LastUsedSnapshot((self.l0, self.l1, self.l2, self.l3))
+
+    @last_used.setter
+    def last_used(self, value: Sequence[int]) -> None:
+        self.l0, self.l1, self.l2, self.l3 = value
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ProtocolState):
+            return NotImplemented
+        return (self.n, self.d, self.last_used) == (other.n, other.d, other.last_used)
+
+    def __repr__(self) -> str:
+        return f"ProtocolState(n={self.n}, d={self.d}, last_used={self.last_used})"
 
     def copy(self) -> 'ProtocolState':
-        return ProtocolState(self.n, self.d, self.last_used.copy())
+        return ProtocolState(self.n, self.d, self.last_used)
 
 
 class FourPartyProtocol:
+    __slots__ = ('n', 'mid', '_d', '_state', '_send_fns')
+
     def __init__(self, n: int, d: int):
         if d >= n // 4:
             raise ValueError("Gap size must be less than a quarter of the sequence length")
         self.n = n
-        self.d = d
+        self._d = d
         self.mid = n // 2  # boundary between the two halves
         self.state = ProtocolState(n=n, d=d)
 
+    # the send handlers capture d and the state object, so replacing either
+    # (e.g. restoring a snapshot with p.state = snap.copy()) rebinds them
+    @property
+    def d(self) -> int:
+        return self._d
+
+    @d.setter
+    def d(self, value: int) -> None:
+        self._d = value
+        self._bind_handlers()
+
+    @property
+    def state(self) -> ProtocolState:
+        return self._state
+
+    @state.setter
+    def state(self, value: ProtocolState) -> None:
+        self._state = value
+        self._bind_handlers()
+
+    # return every party to its starting position, keeping the same state object
+    def reset(self) -> None:
+        s = self.state
+        mid = self.mid
+        s.l0 = -1
+        s.l1 = mid
+        s.l2 = mid - 1
+        s.l3 = self.n
+
     # get the next pad for party to use, or None if cannot send securely
     def get_next_pad(self, party_id: int) -> Optional[int]:
-        s = self.state
+        if not 0 <= party_id < 4:
+            raise ValueError("Invalid party ID")
+        # Party 0/2 move right through their half, Party 1/3 move left; each
+        # must keep a gap of d from its partner in the same half
+        step, partner = PARTY_MOVES[party_id]
+        last_used = self.state.last_used
+        next_pad = last_used[party_id] + step
+        if step * (last_used[partner] - next_pad) <= self.d:
+            return None
+        return next_pad
 
-        if party_id == 0:
-            # Party 0: uses first half from left (0, 1, 2, ...)
-            # Must maintain gap d from Party 1's position
-            next_pad = s.last_used[0] + 1
-            # Cannot cross into Party 1's territory (need gap of d)
-            if next_pad >= s.last_used[1] - self.d:
+    # party sends a message, return pad index used, or None if cannot send
+    def send(self, party_id: int) -> Optional[int]:
+        if not 0 <= party_id < 4:
+            raise ValueError("Invalid party ID")
+        return self._send_fns[party_id]()
+
+    # build the per-party send handlers as closures, so d and the state
+    # are read as local variables instead of attributes on every call
+    def _bind_handlers(self) -> None:
+        s = self._state
+        d = self._d
+
+        # specialised per-party versions of get_next_pad followed by the
+        # update; keep them in line with PARTY_MOVES
+        def send0() -> Optional[int]:
+            next_pad = s.l0 + 1
+            if next_pad >= s.l1 - d:
                 return None
+            s.l0 = next_pad
             return next_pad
 
-        elif party_id == 1:
-            # Party 1: uses first half from right (mid-1, mid-2, ...)
-            # Must maintain gap d from Party 0's position
-            next_pad = s.last_used[1] - 1
-            # Cannot cross into Party 0's territory (need gap of d)
-            if next_pad <= s.last_used[0] + self.d:
+        def send1() -> Optional[int]:
+            next_pad = s.l1 - 1
+            if next_pad <= s.l0 + d:
                 return None
+            s.l1 = next_pad
             return next_pad
 
-        elif party_id == 2:
-            # Party 2: uses second half from left (mid, mid+1, ...)
-            # Must maintain gap d from Party 3's position
-            next_pad = s.last_used[2] + 1
-            # Cannot cross into Party 3's territory (need gap of d)
-            if next_pad >= s.last_used[3] - self.d:
-                return None
-            if next_pad < 0:
+        def send2() -> Optional[int]:
+            next_pad = s.l2 + 1
+            if next_pad >= s.l3 - d:
                 return None
+            s.l2 = next_pad
             return next_pad
 
-        elif party_id == 3:
-            # Party 3: uses second half from right (n-1, n-2, ...)
-            # Must maintain gap d from Party 2's position
-            next_pad = s.last_used[3] - 1
-            # Cannot cross into Party 2's territory (need gap of d)
-            if next_pad <= s.last_used[2] + self.d:
-                return None
-            if next_pad < self.mid:
+        def send3() -> Optional[int]:
+            next_pad = s.l3 - 1
+            if next_pad <= s.l2 + d:
                 return None
+            s.l3 = next_pad
             return next_pad
 
-        else:
-            raise ValueError("Invalid party ID")
-
-    # party sends a message, return pad index used, or None if cannot send
-    def send(self, party_id: int) -> Optional[int]:
-        pad = self.get_next_pad(party_id)
-        if pad is None:
-            return None
-        self.state.last_used[party_id] = pad
-        return pad
+        # indexed by party ID
+        self._send_fns = (send0, send1, send2, send3)
 
     # count total pads used by all parties
+    # each party's pads form one contiguous run from its starting end, so the
+    # total is a sum of four run lengths (a party that never sent contributes 0)
     def get_total_used(self) -> int:
         s = self.state
-        total = 0
-
-        # First half: Party 0 uses [0, last_used[0]], Party 1 uses [last_used[1], mid-1]
-        # Party 0's contribution
-        if s.last_used[0] >= 0:
-            total += s.last_used[0] + 1  # pads 0 to last_used[0]
-
-        # Party 1's contribution
-        if s.last_used[1] < self.mid:
-            total += self.mid - s.last_used[1]  # pads last_used[1] to mid-1
-
-        # Second half: Party 2 uses [mid, last_used[2]], Party 3 uses [last_used[3], n-1]
-        # Party 2's contribution
-        if s.last_used[2] >= self.mid:
-            total += s.last_used[2] - self.mid + 1  # pads mid to last_used[2]
-
-        # Party 3's contribution
-        if s.last_used[3] < self.n:
-            total += self.n - s.last_used[3]  # pads last_used[3] to n-1
+        n = self.n
+        mid = self.mid
 
-        return total
+        # First half: Party 0 uses [0, l0], Party 1 uses [l1, mid-1]
+        # Second half: Party 2 uses [mid, l2], Party 3 uses [l3, n-1]
+        return (s.l0 + 1) + (mid - s.l1) + (s.l2 - mid + 1) + (n - s.l3)
 
     def get_wasted_pads(self) -> int:
         return self.n - self.get_total_used()
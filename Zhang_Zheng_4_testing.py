@@ -6,40 +6,291 @@ Testing program for 4-Party Asynchronous Communication Protocol
 """
 
 import random
-from Zhang_Zheng_4_protocol import FourPartyProtocol
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from Zhang_Zheng_4_protocol import PARTY_MOVES, FourPartyProtocol
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the pure-Python backend needs nothing
+    np = None
+
+if np is not None:
+    _STEP = np.array([step for step, _ in PARTY_MOVES], dtype=np.int64)
+    _PARTNER = np.array([partner for _, partner in PARTY_MOVES], dtype=np.int64)
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional as well
+    njit = None
+
+BACKENDS = ("auto", "python", "numpy", "numba")
 
 def run_single_execution(
     n: int,
     d: int,
     active_parties: list[int],
-    rng: random.Random
+    rng: random.Random,
+    protocol: FourPartyProtocol | None = None
 ) -> tuple[int, int]:
     """
     Run one protocol execution until at least one party cannot send.
+
+    protocol, if given, must have been built with the same n and d; it is
+    reset and reused instead of allocating a new one.
     
     Returns:
         (total_messages_sent, wasted_pads)
     """
-    protocol = FourPartyProtocol(n=n, d=d)
+    if protocol is None:
+        protocol = FourPartyProtocol(n=n, d=d)
+    else:
+        if protocol.n != n or protocol.d != d:
+            raise ValueError("Reused protocol must have the same n and d")
+        protocol.reset()
+    if len(set(active_parties)) == 1:
+        return _analytic_single_party(protocol, active_parties[0])
     total_messages_sent = 0
+    send = protocol.send
     
-    while True:
-        # randomly choose a party to send
-        party_id = rng.choice(active_parties)
-        if protocol.send(party_id) is None:
+    # randomly choose the sending parties up front: every successful send
+    # uses a new pad, so an execution ends within n + 1 steps
+    for party_id in rng.choices(active_parties, k=n + 1):
+        if send(party_id) is None:
             break
         total_messages_sent += 1
         
     wasted_pads = protocol.get_wasted_pads()
     return total_messages_sent, wasted_pads
 
+def _analytic_single_party(
+    protocol: FourPartyProtocol,
+    party_id: int
+) -> tuple[int, int]:
+    """
+    Result of a fresh execution where only party_id sends.
+
+    A lone sender never sees its partner move, so it sends until the next
+    pad would be within d of the partner's starting position.
+
+    Returns:
+        (total_messages_sent, wasted_pads)
+    """
+    if not 0 <= party_id < 4:
+        raise ValueError("Invalid party ID")
+    step, partner = PARTY_MOVES[party_id]
+    last_used = list(protocol.state.last_used)
+    final_pad = last_used[partner] - step * (protocol.d + 1)
+    total_messages_sent = step * (final_pad - last_used[party_id])
+    last_used[party_id] = final_pad
+    protocol.state.last_used = last_used
+    return total_messages_sent, protocol.get_wasted_pads()
+
+if njit is not None:
+    # explicit signatures: compiled (or loaded from cache) at import, not on
+    # the first call
+    @njit("UniTuple(int64, 2)(int64, int64, int64[::1])",
+          cache=True, boundscheck=False)
+    def run_sequence_nb(n, d, sequence):
+        """
+        Compiled protocol execution for a given sequence of senders.
+
+        Same rules as FourPartyProtocol, driven by the PARTY_MOVES table so
+        every party takes the same code path. Stops at the first send that
+        fails, or when the sequence runs out.
+
+        Returns:
+            (total_messages_sent, wasted_pads)
+        """
+        mid = n // 2
+        last = np.empty(4, dtype=np.int64)
+        last[0], last[1], last[2], last[3] = -1, mid, mid - 1, n
+        total_messages_sent = 0
+
+        for party_id in sequence:
+            if party_id < 0 or party_id > 3:
+                raise ValueError("Invalid party ID")
+            step = _STEP[party_id]
+            next_pad = last[party_id] + step
+            if step * (last[_PARTNER[party_id]] - next_pad) <= d:
+                break
+            last[party_id] = next_pad
+            total_messages_sent += 1
+
+        used = (last[0] + 1) + (mid - last[1]) + (last[2] - mid + 1) + (n - last[3])
+        return total_messages_sent, n - used
+
+    @njit("UniTuple(int64, 2)(int64, int64, int64[::1], uint32)",
+          cache=True, boundscheck=False)
+    def run_single_nb(n, d, parties, seed):
+        """
+        Compiled version of run_single_execution.
+
+        parties is an int64 array of the active parties and seed seeds
+        numba's own random state. As in run_single_execution, the n + 1
+        senders an execution can need are drawn up front.
+
+        Returns:
+            (total_messages_sent, wasted_pads)
+        """
+        np.random.seed(seed)
+        sequence = parties[np.random.randint(0, parties.shape[0], n + 1)]
+        return run_sequence_nb(n, d, sequence)
+
+def run_batch_numpy(
+    n: int,
+    d: int,
+    parties: "np.ndarray",
+    gen: "np.random.Generator"
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    Run len(parties) protocol executions side by side with numpy.
+
+    Row i of parties holds the active parties of execution i. Every step
+    advances all executions that are still running by one send, following
+    the same rules as FourPartyProtocol.get_next_pad (see PARTY_MOVES).
+
+    Returns:
+        (total_messages_sent, wasted_pads) arrays, one entry per execution
+    """
+    # negative IDs would wrap around when indexing the tables below
+    if ((parties < 0) | (parties > 3)).any():
+        raise ValueError("Invalid party ID")
+    num_executions, k = parties.shape
+    mid = n // 2
+    last = np.empty((num_executions, 4), dtype=np.int64)
+    last[:] = (-1, mid, mid - 1, n)
+    sent = np.zeros(num_executions, dtype=np.int64)
+    alive = np.arange(num_executions)
+
+    while alive.size:
+        # randomly choose a party to send in every running execution
+        party = parties[alive, gen.integers(0, k, size=alive.size, dtype=np.uint8)]
+        step = _STEP[party]
+        next_pad = last[alive, party] + step
+        valid = step * (last[alive, _PARTNER[party]] - next_pad) > d
+        ok = alive[valid]
+        last[ok, party[valid]] = next_pad[valid]
+        sent[ok] += 1
+        alive = ok
+
+    # same run lengths as FourPartyProtocol.get_total_used
+    l0, l1, l2, l3 = last.T
+    used = (l0 + 1) + (mid - l1) + (l2 - mid + 1) + (n - l3)
+    return sent, n - used
+
+def _choose_parties(
+    scenario_name: str,
+    active_parties: list[int] | None,
+    rng: random.Random
+) -> list[int]:
+    if active_parties is not None:
+        return active_parties
+    if scenario_name == "S.1":
+        return [rng.randint(0, 3)]
+    if scenario_name == "S.2":
+        return rng.sample(range(4), 2)
+    return [0, 1, 2, 3]
+
+# one protocol per (n, d) in each process, reset between executions
+_protocol_pool: dict[tuple[int, int], FourPartyProtocol] = {}
+
+def _run_execution(
+    scenario_name: str,
+    n: int,
+    d: int,
+    active_parties: list[int] | None,
+    backend: str,
+    seed: int
+) -> tuple[int, int]:
+    # one execution, seeded on its own so it can run in any process
+    rng = random.Random(seed)
+    parties = _choose_parties(scenario_name, active_parties, rng)
+    if backend == "numba":
+        return run_single_nb(
+            n, d, np.asarray(parties, dtype=np.int64), rng.randrange(2**32))
+    protocol = _protocol_pool.get((n, d))
+    if protocol is None:
+        protocol = _protocol_pool[(n, d)] = FourPartyProtocol(n=n, d=d)
+    return run_single_execution(n, d, parties, rng, protocol)
+
+def _run_scenario_executions(
+    scenario_name: str,
+    n: int,
+    d: int,
+    active_parties: list[int] | None,
+    num_executions: int,
+    seed: int | None,
+    backend: str,
+    workers: int
+) -> Iterable[tuple[int, int]]:
+    rng = random.Random(seed)
+    seeds = [rng.randrange(2**31) for _ in range(num_executions)]
+    run = partial(_run_execution, scenario_name, n, d, active_parties, backend)
+
+    if workers > 1 and num_executions >= 8:
+        chunksize = max(1, num_executions // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(run, seeds, chunksize=chunksize)
+    else:
+        yield from map(run, seeds)
+
+def _run_scenario_numpy(
+    scenario_name: str,
+    n: int,
+    d: int,
+    active_parties: list[int] | None,
+    num_executions: int,
+    seed: int | None
+) -> Iterable[tuple[int, int]]:
+    # the bit generator is named (PCG64) rather than left to default_rng,
+    # since the stream for a seed is only reproducible while it stays the same
+    gen = np.random.Generator(np.random.PCG64(seed))
+    if active_parties is None:
+        if scenario_name == "S.1":
+            parties = gen.integers(0, 4, size=(num_executions, 1))
+        elif scenario_name == "S.2":
+            # first two parties of a random permutation per execution
+            parties = np.argsort(gen.random((num_executions, 4)), axis=1)[:, :2]
+        else:
+            parties = np.tile(np.arange(4), (num_executions, 1))
+    else:
+        parties = np.tile(np.asarray(active_parties), (num_executions, 1))
+    sent, wasted = run_batch_numpy(n, d, parties, gen)
+    return zip(sent.tolist(), wasted.tolist())
+
+# run_scenario results by arguments, least recently used first; workers is
+# left out of the key because it does not change the result
+SCENARIO_CACHE_SIZE = 256
+_scenario_cache: OrderedDict[tuple, dict] = OrderedDict()
+
+def clear_scenario_cache() -> None:
+    """Forget every result stored by run_scenario."""
+    _scenario_cache.clear()
+
+def _copy_result(result: dict) -> dict:
+    # callers get their own copy, so changing it cannot corrupt the cache
+    result = dict(result)
+    if isinstance(result["active_parties"], list):
+        result["active_parties"] = list(result["active_parties"])
+    if "wasted_pads_list" in result:
+        result["wasted_pads_list"] = array("i", result["wasted_pads_list"])
+    return result
+
 def run_scenario(
     scenario_name: str,
     n: int,
     d: int,
     active_parties: list[int] | None,
     num_executions: int = 100,
-    seed: int | None = None    
+    seed: int | None = None,
+    backend: str = "auto",
+    workers: int = 1,
+    keep_samples: bool = False,
+    use_cache: bool = True
 ) -> dict:
     """
     Run a scenario multiple times and compute statistics.
@@ -51,31 +302,67 @@ def run_scenario(
         active_parties: list of parties can send messages, or None for all parties
         num_executions: number of protocol to run
         seed: random seed for reproducibility
+        backend: "python", "numpy" (all executions at once), "numba"
+            (compiled executions), or "auto" for the fastest one installed.
+            Backends draw different random streams, so results for a given
+            seed depend on the backend; "python" uses only random.Random
+            and is the reproducible reference.
+        workers: number of processes for the python and numba backends;
+            results do not depend on it
+        keep_samples: also return the wasted pads of every execution, as an
+            array.array under "wasted_pads_list"
+        use_cache: return a stored result for identical arguments instead of
+            running again (only with a seed, since the run is then
+            deterministic); the last SCENARIO_CACHE_SIZE results are kept
+            and clear_scenario_cache() drops them
     """
-    rng = random.Random(seed)
-    wasted_pads_list = []
-    sent_messages_list = []
-    
-    for _ in range(num_executions):
-        if active_parties is None:
-            if scenario_name == "S.1":
-                parties = [rng.randint(0, 3)]
-            elif scenario_name == "S.2":
-                parties = rng.sample(range(4), 2)
-            else:
-                parties = [0, 1, 2, 3]
+    if backend == "auto":
+        if njit is not None:
+            backend = "numba"
+        elif np is not None:
+            backend = "numpy"
         else:
-            parties = active_parties
-        sent_messages, wasted_pads = run_single_execution(n, d, parties, rng)
-        sent_messages_list.append(sent_messages)
-        wasted_pads_list.append(wasted_pads)
-        
-        avg_wasted_pads = sum(wasted_pads_list) / len(wasted_pads_list)
-        avg_sent_messages = sum(sent_messages_list) / len(sent_messages_list)
-        max_wasted_pads = max(wasted_pads_list)
-        min_wasted_pads = min(wasted_pads_list)
-    
-    return {
+            backend = "python"
+    key = None
+    if use_cache and seed is not None:
+        parties_key = None if active_parties is None else tuple(active_parties)
+        key = (scenario_name, n, d, parties_key, num_executions, seed,
+               backend, keep_samples)
+        if key in _scenario_cache:
+            _scenario_cache.move_to_end(key)
+            return _copy_result(_scenario_cache[key])
+
+    if backend == "numpy":
+        results = _run_scenario_numpy(
+            scenario_name, n, d, active_parties, num_executions, seed)
+    elif backend in ("python", "numba"):
+        results = _run_scenario_executions(
+            scenario_name, n, d, active_parties, num_executions, seed,
+            backend, workers)
+    else:
+        raise ValueError(f"Unknown backend: {backend}")
+
+    # running statistics, so samples are only kept when asked for
+    sum_wasted_pads = 0
+    sum_sent_messages = 0
+    max_wasted_pads = float("-inf")
+    min_wasted_pads = float("inf")
+    samples = array("i", [0]) * num_executions if keep_samples else None
+
+    for i, (sent_messages, wasted_pads) in enumerate(results):
+        sum_wasted_pads += wasted_pads
+        sum_sent_messages += sent_messages
+        if wasted_pads > max_wasted_pads:
+            max_wasted_pads = wasted_pads
+        if wasted_pads < min_wasted_pads:
+            min_wasted_pads = wasted_pads
+        if samples is not None:
+            samples[i] = wasted_pads
+
+    avg_wasted_pads = sum_wasted_pads / num_executions
+    avg_sent_messages = sum_sent_messages / num_executions
+
+    result = {
         "scenario": scenario_name,
         "n": n,
         "d": d,
@@ -85,8 +372,15 @@ def run_scenario(
         "avg_sent_messages": avg_sent_messages,
         "max_wasted_pads": max_wasted_pads,
         "min_wasted_pads": min_wasted_pads,
-        "wasted_pads_list": wasted_pads_list,
     }
+    if samples is not None:
+        result["wasted_pads_list"] = samples
+    if key is not None:
+        # the cache must not share the caller's active_parties list
+        _scenario_cache[key] = _copy_result(result)
+        if len(_scenario_cache) > SCENARIO_CACHE_SIZE:
+            _scenario_cache.popitem(last=False)
+    return result
 
 def main():
     import argparse
@@ -95,12 +389,18 @@ def main():
     parser.add_argument("-d", type=int, default=10, help="gap size")
     parser.add_argument("-e", "--executions", type=int, default=100, help="number of executions")
     parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="simulation backend")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="always rerun scenarios")
     args = parser.parse_args()
     
     n = args.n
     d = args.d
     num_executions = args.executions
     seed = args.seed
+    backend = args.backend
+    workers = args.jobs
+    use_cache = not args.no_cache
     
     print("=" * 60)
     print("4-Party Protocol Testing")
@@ -109,7 +409,8 @@ def main():
     print()
     
     # Scenario S.1: one randomly chosen party sends
-    s1 = run_scenario("S.1", n, d, None, num_executions, seed)
+    s1 = run_scenario("S.1", n, d, None, num_executions, seed, backend, workers,
+                      use_cache=use_cache)
     print(f"Scenario S.1 - 1 randomly chosen party:")
     print(f"  Avg wasted pads: {s1['avg_wasted_pads']:.2f}")
     print(f"  Avg messages sent: {s1['avg_sent_messages']:.2f}")
@@ -117,7 +418,8 @@ def main():
     print()    
     
     # Scenario S.2: two randomly chosen parties send
-    s2 = run_scenario("S.2", n, d, None, num_executions, seed)
+    s2 = run_scenario("S.2", n, d, None, num_executions, seed, backend, workers,
+                      use_cache=use_cache)
     print(f"Scenario S.2 - 2 randomly chosen parties:")
     print(f"  Avg wasted pads: {s2['avg_wasted_pads']:.2f}")
     print(f"  Avg messages sent: {s2['avg_sent_messages']:.2f}")
@@ -125,7 +427,8 @@ def main():
     print()    
     
     # Scenario S.4: All 4 parties send
-    s4 = run_scenario("S.4", n, d, [0,1,2,3], num_executions, seed)
+    s4 = run_scenario("S.4", n, d, [0,1,2,3], num_executions, seed, backend, workers,
+                      use_cache=use_cache)
     print(f"Scenario S.4 - All 4 parties:")
     print(f"  Avg wasted pads: {s4['avg_wasted_pads']:.2f}")
     print(f"  Avg messages sent: {s4['avg_sent_messages']:.2f}")
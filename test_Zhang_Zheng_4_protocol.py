@@ -0,0 +1,86 @@
+"""
+Tests for Zhang_Zheng_4_protocol
+Run with: python -m unittest
+"""
+
+import random
+import unittest
+from Zhang_Zheng_4_protocol import FourPartyProtocol
+
+
+# get_total_used as originally written, with a guard per run
+def guarded_total_used(p: FourPartyProtocol) -> int:
+    last_used = p.state.last_used
+    total = 0
+    if last_used[0] >= 0:
+        total += last_used[0] + 1
+    if last_used[1] < p.mid:
+        total += p.mid - last_used[1]
+    if last_used[2] >= p.mid:
+        total += last_used[2] - p.mid + 1
+    if last_used[3] < p.n:
+        total += p.n - last_used[3]
+    return total
+
+
+class TestGetTotalUsed(unittest.TestCase):
+    def test_matches_guarded_version_on_reachable_states(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            n = rng.randint(4, 300)
+            d = rng.randint(0, n // 4 - 1)
+            parties = rng.sample(range(4), rng.randint(1, 4))
+            p = FourPartyProtocol(n=n, d=d)
+            self.assertEqual(p.get_total_used(), guarded_total_used(p))
+            while p.send(rng.choice(parties)) is not None:
+                self.assertEqual(p.get_total_used(), guarded_total_used(p))
+            self.assertEqual(p.get_total_used(), guarded_total_used(p))
+
+
+class TestProtocolState(unittest.TestCase):
+    def test_last_used_item_assignment_fails(self):
+        p = FourPartyProtocol(n=100, d=5)
+        with self.assertRaises(TypeError):
+            p.state.last_used[0] = 3
+        with self.assertRaises(TypeError):
+            p.state.last_used.append(3)
+        self.assertEqual(p.state.last_used, [-1, 50, 49, 100])
+
+    def test_last_used_compares_equal_to_list(self):
+        last_used = FourPartyProtocol(n=100, d=5).state.last_used
+        self.assertTrue(last_used == [-1, 50, 49, 100])
+        self.assertIsInstance(last_used, list)
+
+    def test_last_used_assignment_and_copy(self):
+        s = FourPartyProtocol(n=100, d=5).state
+        s.last_used = [3, 40, 60, 90]
+        self.assertEqual((s.l0, s.l1, s.l2, s.l3), (3, 40, 60, 90))
+        c = s.copy()
+        self.assertEqual(c, s)
+        c.l0 = 4
+        self.assertNotEqual(c, s)
+
+
+
+class TestFourPartyProtocol(unittest.TestCase):
+    def test_send_follows_restored_snapshot(self):
+        p = FourPartyProtocol(n=100, d=5)
+        snap = p.state.copy()
+        for _ in range(3):
+            p.send(0)
+        p.state = snap.copy()
+        self.assertEqual(p.get_next_pad(0), 0)
+        self.assertEqual(p.send(0), 0)
+        self.assertEqual(p.state.last_used, [0, 50, 49, 100])
+
+    def test_send_follows_changed_d(self):
+        p = FourPartyProtocol(n=100, d=5)
+        p.d = 20
+        sent = 0
+        while p.send(0) is not None:
+            sent += 1
+        self.assertEqual(sent, 50 - 20)
+        self.assertIsNone(p.get_next_pad(0))
+
+if __name__ == "__main__":
+    unittest.main()
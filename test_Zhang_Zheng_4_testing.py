@@ -0,0 +1,183 @@
+"""
+Tests for Zhang_Zheng_4_testing
+Run with: python -m unittest
+"""
+
+import random
+import unittest
+from Zhang_Zheng_4_protocol import FourPartyProtocol
+import Zhang_Zheng_4_testing as testing
+from Zhang_Zheng_4_testing import _analytic_single_party, run_single_execution
+
+np = testing.np
+
+
+# random sender sequences of length n + 1, enough to end any execution
+def random_sequences(count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        n = rng.randint(4, 300)
+        d = rng.randint(0, n // 4 - 1)
+        parties = rng.sample(range(4), rng.randint(2, 4))
+        yield n, d, [rng.choice(parties) for _ in range(n + 1)]
+
+
+# run the sequence through FourPartyProtocol, checking get_next_pad
+# predicts every send and every pad stays in the sender's half (the
+# original explicit check for Party 3 is implied by the gap rule)
+def run_protocol(test, n: int, d: int, sequence: list[int]) -> tuple[int, int]:
+    p = FourPartyProtocol(n=n, d=d)
+    sent = 0
+    for party_id in sequence:
+        expected = p.get_next_pad(party_id)
+        test.assertEqual(p.send(party_id), expected)
+        if expected is None:
+            break
+        if party_id < 2:
+            test.assertTrue(0 <= expected < p.mid)
+        else:
+            test.assertTrue(p.mid <= expected < n)
+        sent += 1
+    return sent, p.get_wasted_pads()
+
+
+# stands in for a numpy Generator, returning scripted column indices
+class ScriptedGen:
+    def __init__(self, indices: list[int]):
+        self.indices = iter(indices)
+
+    def integers(self, low, high, size, dtype):
+        return np.array([next(self.indices) for _ in range(size)], dtype=dtype)
+
+
+class TestAnalyticSingleParty(unittest.TestCase):
+    def test_matches_send_loop(self):
+        for n in range(4, 120):
+            for d in range(n // 4):
+                for party_id in range(4):
+                    p = FourPartyProtocol(n=n, d=d)
+                    sent = 0
+                    while p.send(party_id) is not None:
+                        sent += 1
+                    expected = (sent, p.get_wasted_pads(), p.state.last_used)
+
+                    q = FourPartyProtocol(n=n, d=d)
+                    got = _analytic_single_party(q, party_id)
+                    self.assertEqual(got + (q.state.last_used,), expected,
+                                     (n, d, party_id))
+                    self.assertEqual(
+                        run_single_execution(n, d, [party_id], random.Random(0)),
+                        expected[:2])
+
+
+class TestRunSingleExecution(unittest.TestCase):
+    def test_reused_protocol_matches_fresh(self):
+        p = FourPartyProtocol(n=200, d=5)
+        for seed in range(20):
+            self.assertEqual(
+                run_single_execution(200, 5, [0, 1, 2, 3], random.Random(seed), p),
+                run_single_execution(200, 5, [0, 1, 2, 3], random.Random(seed)))
+
+    def test_reused_protocol_must_match_n_and_d(self):
+        p = FourPartyProtocol(n=200, d=5)
+        with self.assertRaises(ValueError):
+            run_single_execution(100, 5, [0, 1], random.Random(0), p)
+        with self.assertRaises(ValueError):
+            run_single_execution(200, 6, [0, 1], random.Random(0), p)
+
+
+class TestScenarioCache(unittest.TestCase):
+    def setUp(self):
+        testing.clear_scenario_cache()
+
+    def tearDown(self):
+        testing.clear_scenario_cache()
+
+    def test_hit_is_unaffected_by_mutation(self):
+        parties = [0, 1]
+        first = testing.run_scenario("S.x", 100, 5, parties, 5, 3,
+                                     backend="python", keep_samples=True)
+        expected = testing.run_scenario("S.x", 100, 5, [0, 1], 5, 3,
+                                        backend="python", keep_samples=True,
+                                        use_cache=False)
+        self.assertEqual(first, expected)
+        parties.append(2)
+        first["active_parties"].append(3)
+        first["wasted_pads_list"][0] = -1
+        first["avg_wasted_pads"] = -1
+        hit = testing.run_scenario("S.x", 100, 5, [0, 1], 5, 3,
+                                   backend="python", keep_samples=True)
+        self.assertEqual(hit, expected)
+
+    def test_key_includes_backend_and_keep_samples(self):
+        testing.run_scenario("S.4", 100, 5, None, 5, 3, backend="python")
+        with_samples = testing.run_scenario("S.4", 100, 5, None, 5, 3,
+                                            backend="python", keep_samples=True)
+        self.assertIn("wasted_pads_list", with_samples)
+        self.assertEqual(len(testing._scenario_cache), 2)
+        if np is not None:
+            testing.run_scenario("S.4", 100, 5, None, 5, 3, backend="numpy")
+            self.assertEqual(len(testing._scenario_cache), 3)
+
+    def test_unseeded_runs_are_not_cached(self):
+        testing.run_scenario("S.4", 100, 5, None, 5, None, backend="python")
+        self.assertEqual(len(testing._scenario_cache), 0)
+
+    def test_cache_is_bounded(self):
+        for seed in range(testing.SCENARIO_CACHE_SIZE + 10):
+            testing.run_scenario("S.1", 20, 1, None, 1, seed, backend="python")
+        self.assertEqual(len(testing._scenario_cache), testing.SCENARIO_CACHE_SIZE)
+
+
+class TestRunScenario(unittest.TestCase):
+    def test_results_do_not_depend_on_workers(self):
+        for backend in ("python", "numba"):
+            if backend == "numba" and testing.njit is None:
+                continue
+            for scenario in ("S.2", "S.4"):
+                runs = [testing.run_scenario(scenario, 200, 5, None, 40, 11,
+                                             backend=backend, workers=workers,
+                                             keep_samples=True, use_cache=False)
+                        for workers in (1, 2)]
+                self.assertEqual(runs[0], runs[1], (backend, scenario))
+
+
+    def test_statistics_match_samples(self):
+        results = list(testing._run_scenario_executions(
+            "S.2", 200, 5, None, 30, 4, "python", 1))
+        sent = [r[0] for r in results]
+        wasted = [r[1] for r in results]
+        r = testing.run_scenario("S.2", 200, 5, None, 30, 4, backend="python",
+                                 keep_samples=True, use_cache=False)
+        self.assertEqual(list(r["wasted_pads_list"]), wasted)
+        self.assertEqual(r["avg_wasted_pads"], sum(wasted) / 30)
+        self.assertEqual(r["avg_sent_messages"], sum(sent) / 30)
+        self.assertEqual(r["max_wasted_pads"], max(wasted))
+        self.assertEqual(r["min_wasted_pads"], min(wasted))
+
+    def test_samples_only_kept_when_asked(self):
+        r = testing.run_scenario("S.4", 200, 5, None, 10, 4, backend="python",
+                                 use_cache=False)
+        self.assertNotIn("wasted_pads_list", r)
+
+
+class TestKernelsAgree(unittest.TestCase):
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_numpy_matches_protocol(self):
+        for n, d, sequence in random_sequences(300, 1):
+            # one execution with all four parties; the scripted column is
+            # the party ID itself
+            sent, wasted = testing.run_batch_numpy(
+                n, d, np.array([[0, 1, 2, 3]]), ScriptedGen(sequence))
+            self.assertEqual((int(sent[0]), int(wasted[0])),
+                             run_protocol(self, n, d, sequence), (n, d))
+
+    @unittest.skipIf(testing.njit is None, "numba not installed")
+    def test_numba_matches_protocol(self):
+        for n, d, sequence in random_sequences(300, 2):
+            got = testing.run_sequence_nb(n, d, np.array(sequence, dtype=np.int64))
+            self.assertEqual(got, run_protocol(self, n, d, sequence), (n, d))
+
+
+if __name__ == "__main__":
+    unittest.main()